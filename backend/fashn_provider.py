@@ -6,16 +6,31 @@ API Documentation: https://docs.fashn.ai/
 
 The Product-to-Model endpoint generates realistic images of AI models wearing clothing
 from flat-lay or ghost mannequin product photos.
+
+Requests are spread over a pool of API keys (FASHN_API_KEYS) so throughput is not
+capped by a single account. Optionally, a prediction that runs past the observed p95
+completion time is hedged with a duplicate on another key; the first result wins.
+
+When FASHN_WEBHOOK_URL (and FASHN_WEBHOOK_SECRET) are set, FASHN.ai notifies our
+receiver endpoint on completion and the waiting job checks the status right away;
+status polling drops to a slow fallback sweep while callbacks keep arriving.
 """
 
 import os
+import re
+import hmac
+import time
 import httpx
 import asyncio
 import logging
 import base64
-from typing import Optional, Dict, Any
+from collections import deque
+from typing import Optional, Dict, Any, List
 
 from dotenv import load_dotenv
+from tracing import get_tracer
+from lifecycle import record_prediction, take_resume_predictions
+from speculative import record_speculative_spend
 
 # Load environment variables
 load_dotenv()
@@ -24,45 +39,175 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Hedging configuration
+HEDGE_ENABLED = os.getenv("FASHN_HEDGE_ENABLED", "false").lower() == "true"
+HEDGE_BUDGET = float(os.getenv("FASHN_HEDGE_BUDGET", 0.1))  # Max fraction of generations that may be hedged
+HEDGE_MIN_SAMPLES = int(os.getenv("FASHN_HEDGE_MIN_SAMPLES", 20))  # Completions needed before p95 is trusted
+HEDGE_WINDOW_SECONDS = 600  # Rolling window the hedge budget is enforced over
+
+# Webhook completion configuration
+WEBHOOK_URL = os.getenv("FASHN_WEBHOOK_URL")  # Public URL of /api/webhooks/fashn
+WEBHOOK_SECRET = os.getenv("FASHN_WEBHOOK_SECRET")
+WEBHOOK_SWEEP_INTERVAL = float(os.getenv("FASHN_WEBHOOK_SWEEP_INTERVAL", 15))  # Fallback poll interval
+WEBHOOK_MIN_DELIVERY_RATE = 0.8  # Below this share of completions seen via callback, poll normally
+
+# Key health tracking
+HEALTH_ALPHA = 0.2  # EWMA weight of the latest outcome
+MIN_HEALTH = 0.05
+
+
+# ============================================
+# Log Redaction
+# ============================================
+
+_TOKEN_PATTERN = re.compile(r"(token(?:=|%3D))(.*?)(?=%26|&|\s|\"|$)")
+
+
+class WebhookTokenFilter(logging.Filter):
+    """Masks the webhook token in logged URLs (httpx requests, uvicorn access log)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = record.getMessage()
+        if "token" in message:
+            record.msg = _TOKEN_PATTERN.sub(r"\1***", message)
+            record.args = ()
+        return True
+
+
+# ============================================
+# API Key Pool
+# ============================================
+
+class ApiKeyEndpoint:
+    """A single FASHN.ai account (API key + base URL) with load and health stats."""
+
+    def __init__(self, api_key: str, base_url: str):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.in_flight = 0
+        self.health = 1.0  # EWMA of request success, 1.0 = healthy
+
+    @property
+    def label(self) -> str:
+        return f"{self.api_key[:6]}..."
+
+    def record_success(self):
+        self.health = self.health * (1 - HEALTH_ALPHA) + HEALTH_ALPHA
+
+    def record_failure(self, rate_limited: bool = False):
+        self.health *= (1 - HEALTH_ALPHA)
+        if rate_limited:
+            # Back off harder from an account that is throttling us
+            self.health *= 0.5
+
+    def record_error_status(self, status_code: int):
+        """Count an error response against the key only if the account is at fault."""
+        # 4xx other than 429 means a bad request (e.g. an unusable user image), not a bad key
+        if status_code == 429 or status_code >= 500:
+            self.record_failure(rate_limited=status_code == 429)
+
+    def load_score(self) -> float:
+        """Lower is better: in-flight work scaled up by poor health."""
+        return (self.in_flight + 1) / max(self.health, MIN_HEALTH)
+
+
+class ApiKeyPool:
+    """Health-weighted least-loaded selection over FASHN.ai API keys."""
+
+    def __init__(self, endpoints: List[ApiKeyEndpoint]):
+        self.endpoints = endpoints
+
+    @classmethod
+    def from_env(cls, default_base_url: str) -> "ApiKeyPool":
+        """
+        Build the pool from FASHN_API_KEYS, falling back to FASHN_API_KEY.
+
+        FASHN_API_KEYS is comma-separated; each entry is either a key or
+        "key@base_url" to route that key to a different endpoint.
+        """
+        raw = os.getenv("FASHN_API_KEYS") or os.getenv("FASHN_API_KEY") or ""
+        endpoints = []
+        for entry in raw.split(","):
+            entry = entry.strip()
+            if not entry:
+                continue
+            api_key, _, base_url = entry.partition("@")
+            endpoints.append(ApiKeyEndpoint(api_key.strip(), base_url.strip() or default_base_url))
+        return cls(endpoints)
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def acquire(self, exclude: Optional[List[ApiKeyEndpoint]] = None) -> ApiKeyEndpoint:
+        """Pick the least-loaded healthy endpoint and count a request against it."""
+        candidates = [e for e in self.endpoints if not exclude or e not in exclude]
+        if not candidates:
+            raise ValueError("No FASHN.ai API key available")
+        endpoint = min(candidates, key=lambda e: e.load_score())
+        endpoint.in_flight += 1
+        return endpoint
+
+    def release(self, endpoint: ApiKeyEndpoint):
+        endpoint.in_flight = max(0, endpoint.in_flight - 1)
+
+
+# ============================================
+# Provider
+# ============================================
 
 class FashnProvider:
     """FASHN.ai API Provider for product-to-model image generation."""
-    
-    BASE_URL = "https://api.fashn.ai/v1"
-    
+
+    BASE_URL = os.getenv("FASHN_BASE_URL", "https://api.fashn.ai/v1")
+
     def __init__(self):
-        self.api_key = os.getenv("FASHN_API_KEY")
+        self.pool = ApiKeyPool.from_env(self.BASE_URL)
+        # First key kept for startup checks and backwards compatibility
+        self.api_key = self.pool.endpoints[0].api_key if self.pool.endpoints else None
         if not self.api_key:
             logger.warning("FASHN_API_KEY not found in environment variables.")
-    
-    async def run_product_to_model(
+
+        # Which account owns each running prediction (status must use the same key)
+        self._predictions: Dict[str, ApiKeyEndpoint] = {}
+
+        # Hedging state
+        self.hedge_enabled = HEDGE_ENABLED
+        self.hedge_budget = HEDGE_BUDGET
+        self._completion_times: deque = deque(maxlen=500)
+        # Timestamps of generations and hedges within the budget window
+        self._generation_times: deque = deque()
+        self._hedge_times: deque = deque()
+
+        # Webhook state: jobs waiting on a prediction, and notifications received for them
+        self.webhook_url = WEBHOOK_URL
+        self.webhook_secret = WEBHOOK_SECRET
+        if self.webhook_url and not self.webhook_secret:
+            logger.warning("FASHN_WEBHOOK_URL is set without FASHN_WEBHOOK_SECRET; webhook completion disabled")
+            self.webhook_url = None
+        if self.webhook_url:
+            for name in ("httpx", "uvicorn.access"):
+                logging.getLogger(name).addFilter(WebhookTokenFilter())
+        self._waiters: Dict[str, asyncio.Event] = {}
+        self._notifications: set = set()
+        # Whether recent completions were seen via callback (False: found by polling first)
+        self._webhook_deliveries: deque = deque(maxlen=10)
+
+    def _build_payload(
         self,
         product_image_url: str = None,
         product_image_base64: str = None,
         model_image_url: str = None,
         model_image_base64: str = None,
-        prompt: str = "", # Added prompt
-        category: str = "tops", # Deprecated but kept in signature for compatibility
-        mode: str = "generate",  # 'generate' or 'try-on'
-        num_samples: int = 1,
-        restore_clothes: bool = False, # Deprecated
-        adjust_hands: bool = False, # Deprecated
-        restore_background: bool = False, # Deprecated
-        garment_photo_type: str = "auto", # Deprecated
-        long_top: bool = False # Deprecated
+        prompt: str = "",
+        mode: str = "generate"
     ) -> Dict[str, Any]:
-        """
-        Run the Product-to-Model generation using new API format.
-        """
-        if not self.api_key:
-            raise ValueError("FASHN_API_KEY is not configured")
-        
+        """Build the request payload for the new API schema."""
         # Build inputs dictionary for new API schema
         inputs = {}
-        
+
         if prompt:
             inputs["prompt"] = prompt
-        
+
         # Add product image
         if product_image_base64:
             inputs["product_image"] = f"data:image/jpeg;base64,{product_image_base64}"
@@ -70,74 +215,237 @@ class FashnProvider:
             inputs["product_image"] = product_image_url
         else:
             raise ValueError("Either product_image_url or product_image_base64 is required")
-        
+
         # Add model image for try-on mode
         if mode == "try-on":
             if model_image_base64:
                 inputs["model_image"] = f"data:image/jpeg;base64,{model_image_base64}"
             elif model_image_url:
                 inputs["model_image"] = model_image_url
-                
+
             # If try-on mode is clearer with a specific model name, we could switch here.
             # But we stick to product-to-model as it covers both according to docs.
-        
+
         # Construct full payload
-        payload = {
+        return {
             "model_name": "product-to-model",
             "inputs": inputs
         }
-        
-        logger.info(f"Starting FASHN.ai Product-to-Model generation (model: product-to-model)")
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.BASE_URL}/run",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                },
-                json=payload,
-                timeout=60.0
-            )
-            
-            if response.status_code != 200:
-                error_text = response.text
-                logger.error(f"FASHN.ai run error: {response.status_code} - {error_text}")
-                raise ValueError(f"FASHN.ai API error: {error_text}")
-            
-            data = response.json()
-            logger.info(f"FASHN.ai job started: {data.get('id')}")
-            return data
-    
+
+    async def _submit(
+        self,
+        payload: Dict[str, Any],
+        exclude: Optional[List[ApiKeyEndpoint]] = None
+    ) -> Dict[str, Any]:
+        """Submit a payload using the least-loaded key in the pool."""
+        endpoint = self.pool.acquire(exclude=exclude)
+
+        logger.info(f"Starting FASHN.ai Product-to-Model generation (model: product-to-model, key: {endpoint.label})")
+
+        params = {}
+        if self.webhook_url:
+            params["webhook_url"] = self._callback_url()
+
+        try:
+            with get_tracer().span("fashn.run", key=endpoint.label) as span:
+                async with httpx.AsyncClient() as client:
+                    response = await client.post(
+                        f"{endpoint.base_url}/run",
+                        headers={
+                            "Authorization": f"Bearer {endpoint.api_key}",
+                            "Content-Type": "application/json"
+                        },
+                        params=params,
+                        json=payload,
+                        timeout=60.0
+                    )
+                    span.set(http_status=response.status_code)
+
+                    if response.status_code != 200:
+                        error_text = response.text
+                        logger.error(f"FASHN.ai run error: {response.status_code} - {error_text}")
+                        endpoint.record_error_status(response.status_code)
+                        raise ValueError(f"FASHN.ai API error: {error_text}")
+
+                    data = response.json()
+                    span.set(prediction_id=data.get("id"))
+        except httpx.HTTPError:
+            endpoint.record_failure()
+            self.pool.release(endpoint)
+            raise
+        except Exception:
+            self.pool.release(endpoint)
+            raise
+
+        endpoint.record_success()
+        if data.get("id"):
+            self._predictions[data["id"]] = endpoint
+            record_prediction(data["id"], self.pool.endpoints.index(endpoint))
+            record_speculative_spend()
+        else:
+            self.pool.release(endpoint)
+        logger.info(f"FASHN.ai job started: {data.get('id')}")
+        return data
+
+    def _adopt_prediction(self, prediction_id: str, key_index: int):
+        """Re-attach a prediction started by a previous process to its key."""
+        if 0 <= key_index < len(self.pool):
+            endpoint = self.pool.endpoints[key_index]
+        else:
+            endpoint = self.pool.endpoints[0]
+        endpoint.in_flight += 1
+        self._predictions[prediction_id] = endpoint
+
+    def _release_prediction(self, prediction_id: str):
+        """Stop counting a prediction against its key. Safe to call more than once."""
+        endpoint = self._predictions.pop(prediction_id, None)
+        if endpoint:
+            self.pool.release(endpoint)
+
+    async def run_product_to_model(
+        self,
+        product_image_url: str = None,
+        product_image_base64: str = None,
+        model_image_url: str = None,
+        model_image_base64: str = None,
+        prompt: str = "", # Added prompt
+        category: str = "tops", # Deprecated but kept in signature for compatibility
+        mode: str = "generate",  # 'generate' or 'try-on'
+        num_samples: int = 1,
+        restore_clothes: bool = False, # Deprecated
+        adjust_hands: bool = False, # Deprecated
+        restore_background: bool = False, # Deprecated
+        garment_photo_type: str = "auto", # Deprecated
+        long_top: bool = False # Deprecated
+    ) -> Dict[str, Any]:
+        """
+        Run the Product-to-Model generation using new API format.
+        """
+        if not self.pool:
+            raise ValueError("FASHN_API_KEY is not configured")
+
+        payload = self._build_payload(
+            product_image_url=product_image_url,
+            product_image_base64=product_image_base64,
+            model_image_url=model_image_url,
+            model_image_base64=model_image_base64,
+            prompt=prompt,
+            mode=mode
+        )
+        return await self._submit(payload)
+
     async def get_status(self, prediction_id: str) -> Dict[str, Any]:
         """
         Get the status of a prediction.
-        
+
         Args:
             prediction_id: The ID returned from run_product_to_model
-        
+
         Returns:
             Dict with status and output images when complete
         """
-        if not self.api_key:
+        if not self.pool:
             raise ValueError("FASHN_API_KEY is not configured")
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.BASE_URL}/status/{prediction_id}",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}"
-                },
-                timeout=30.0
-            )
-            
-            if response.status_code != 200:
-                error_text = response.text
-                logger.error(f"FASHN.ai status error: {response.status_code} - {error_text}")
-                raise ValueError(f"FASHN.ai status error: {error_text}")
-            
-            return response.json()
-    
+
+        endpoint = self._predictions.get(prediction_id) or self.pool.endpoints[0]
+
+        with get_tracer().span("fashn.status", prediction_id=prediction_id, key=endpoint.label) as span:
+            async with httpx.AsyncClient() as client:
+                response = await client.get(
+                    f"{endpoint.base_url}/status/{prediction_id}",
+                    headers={
+                        "Authorization": f"Bearer {endpoint.api_key}"
+                    },
+                    timeout=30.0
+                )
+                span.set(http_status=response.status_code)
+
+                if response.status_code != 200:
+                    error_text = response.text
+                    logger.error(f"FASHN.ai status error: {response.status_code} - {error_text}")
+                    endpoint.record_error_status(response.status_code)
+                    raise ValueError(f"FASHN.ai status error: {error_text}")
+
+                endpoint.record_success()
+                data = response.json()
+                span.set(status=data.get("status"))
+
+        if data.get("status") in ("completed", "failed"):
+            self._release_prediction(prediction_id)
+        return data
+
+    # ============================================
+    # Hedging
+    # ============================================
+
+    def _p95_completion_time(self) -> Optional[float]:
+        """Observed p95 completion time in seconds, once enough samples exist."""
+        if len(self._completion_times) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._completion_times)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def _count_in_window(self, times: deque) -> int:
+        cutoff = time.monotonic() - HEDGE_WINDOW_SECONDS
+        while times and times[0] < cutoff:
+            times.popleft()
+        return len(times)
+
+    def _should_hedge(self, running_for: float) -> bool:
+        if not self.hedge_enabled or len(self.pool) < 2:
+            return False
+        p95 = self._p95_completion_time()
+        if p95 is None or running_for < p95:
+            return False
+        # Budget is per rolling window, so calm periods don't bank hedges for a slow spell
+        generations = self._count_in_window(self._generation_times)
+        return self._count_in_window(self._hedge_times) < self.hedge_budget * generations
+
+    # ============================================
+    # Webhook Completion
+    # ============================================
+
+    def _callback_url(self) -> str:
+        """Webhook URL registered with FASHN.ai, carrying the shared secret."""
+        separator = "&" if "?" in self.webhook_url else "?"
+        return f"{self.webhook_url}{separator}token={self.webhook_secret}"
+
+    def _webhooks_arriving(self) -> bool:
+        """
+        Whether completions are reaching this process via callback.
+
+        With several workers or instances, most callbacks land on a process that is
+        not waiting for them; jobs then poll at the normal interval instead.
+        """
+        if not self._webhook_deliveries:
+            return True
+        delivered = sum(self._webhook_deliveries) / len(self._webhook_deliveries)
+        return delivered >= WEBHOOK_MIN_DELIVERY_RATE
+
+    def verify_webhook_token(self, token: Optional[str]) -> bool:
+        if not self.webhook_secret:
+            return False
+        return token is not None and hmac.compare_digest(token, self.webhook_secret)
+
+    def resolve_webhook(self, payload: Dict[str, Any]) -> bool:
+        """
+        Wake the job waiting on a notified prediction.
+
+        The payload is only used for its prediction id; the job confirms the
+        outcome (and takes output URLs) from its own status call.
+
+        Returns:
+            True if a waiting job in this process was resolved
+        """
+        prediction_id = payload.get("id")
+        event = self._waiters.get(prediction_id)
+        if event is None:
+            # Not ours (other worker, or job already gone) - the sweep covers it
+            return False
+        self._notifications.add(prediction_id)
+        event.set()
+        return True
+
     async def generate_and_wait(
         self,
         product_image_base64: str,
@@ -149,40 +457,131 @@ class FashnProvider:
     ) -> Dict[str, Any]:
         """
         Generate image and wait for completion.
+
+        In webhook mode a callback triggers an immediate status check, with a
+        status poll every FASHN_WEBHOOK_SWEEP_INTERVAL seconds as a fallback
+        (or every poll_interval when callbacks are not reaching this process).
+
+        If hedging is enabled and the prediction outlives the observed p95,
+        a duplicate is submitted on another key and the first to complete wins.
         """
-        # Start the generation
-        result = await self.run_product_to_model(
+        if not self.pool:
+            raise ValueError("FASHN_API_KEY is not configured")
+
+        payload = self._build_payload(
             product_image_base64=product_image_base64,
             prompt=prompt,
-            category=category,
             mode=mode
         )
-        
-        prediction_id = result.get("id")
-        if not prediction_id:
-            raise ValueError("No prediction ID returned from FASHN.ai")
-        
-        logger.info(f"Waiting for FASHN.ai generation to complete (ID: {prediction_id})")
-        
-        # Poll for completion
-        elapsed = 0
-        while elapsed < timeout_seconds:
-            status = await self.get_status(prediction_id)
-            state = status.get("status")
-            
-            if state == "completed":
-                logger.info("FASHN.ai generation completed successfully")
-                return status
-            elif state == "failed":
-                error_msg = status.get("error", "Unknown error")
-                logger.error(f"FASHN.ai generation failed: {error_msg}")
-                raise ValueError(f"FASHN.ai generation failed: {error_msg}")
-            
-            logger.info(f"FASHN.ai status: {state}, waiting...")
-            await asyncio.sleep(poll_interval)
-            elapsed += poll_interval
-        
-        raise TimeoutError(f"FASHN.ai generation timed out after {timeout_seconds} seconds")
+        # Webhook mode only polls on the slow sweep, while callbacks are reaching this process
+        if self.webhook_url and self._webhooks_arriving():
+            sweep_interval = max(WEBHOOK_SWEEP_INTERVAL, poll_interval)
+        else:
+            sweep_interval = poll_interval
+        notified = asyncio.Event()
+
+        with get_tracer().span("fashn.generate_and_wait", mode=mode, webhook=bool(self.webhook_url)) as span:
+            # A job resumed after a restart waits on its existing predictions
+            resumed = take_resume_predictions()
+            if resumed:
+                for prediction in resumed:
+                    self._adopt_prediction(prediction["id"], prediction.get("key_index", 0))
+                pending = [prediction["id"] for prediction in resumed]
+                prediction_id = pending[0]
+                # Never hedge a resumed job, and poll right away in case it already finished
+                hedged = True
+                last_sweep = time.monotonic() - sweep_interval
+                span.set(resumed=True)
+            else:
+                # Start the generation
+                result = await self._submit(payload)
+                self._generation_times.append(time.monotonic())
+
+                prediction_id = result.get("id")
+                if not prediction_id:
+                    raise ValueError("No prediction ID returned from FASHN.ai")
+                pending = [prediction_id]
+                hedged = False
+                last_sweep = time.monotonic()
+            for pid in pending:
+                self._waiters[pid] = notified
+            span.set(prediction_id=prediction_id)
+
+            logger.info(f"Waiting for FASHN.ai generation to complete (ID: {prediction_id})")
+
+            # Submission time of every prediction racing for this result
+            started = {pid: time.monotonic() for pid in pending}
+            deadline = time.monotonic() + timeout_seconds
+
+            try:
+                while time.monotonic() < deadline:
+                    sweep_due = time.monotonic() - last_sweep >= sweep_interval
+                    if sweep_due:
+                        last_sweep = time.monotonic()
+
+                    state = None
+                    for pid in list(pending):
+                        via_webhook = pid in self._notifications
+                        self._notifications.discard(pid)
+                        if not (via_webhook or sweep_due):
+                            continue
+                        status = await self.get_status(pid)
+                        state = status.get("status")
+
+                        if state == "completed":
+                            span.set(completed_via="webhook" if via_webhook else "poll")
+                            if not resumed:
+                                # Sample the original prediction: a winning hedge's short runtime
+                                # would bias the p95 low and trigger ever more hedges
+                                self._completion_times.append(time.monotonic() - started[prediction_id])
+                                if self.webhook_url:
+                                    self._webhook_deliveries.append(via_webhook)
+                            if pid != prediction_id:
+                                logger.info(f"FASHN.ai hedged prediction {pid} won over {prediction_id}")
+                                span.set(hedge_won=True)
+                            logger.info("FASHN.ai generation completed successfully")
+                            return status
+                        elif state == "failed":
+                            error_msg = status.get("error", "Unknown error")
+                            logger.error(f"FASHN.ai generation failed: {error_msg}")
+                            pending.remove(pid)
+                            if not pending:
+                                raise ValueError(f"FASHN.ai generation failed: {error_msg}")
+
+                    if not hedged and self._should_hedge(time.monotonic() - started[prediction_id]):
+                        hedged = True
+                        self._hedge_times.append(time.monotonic())
+                        exclude = [self._predictions[pid] for pid in pending if pid in self._predictions]
+                        try:
+                            hedge = await self._submit(payload, exclude=exclude)
+                        except Exception as e:
+                            logger.warning(f"FASHN.ai hedge submission failed: {e}")
+                        else:
+                            if hedge.get("id"):
+                                started[hedge["id"]] = time.monotonic()
+                                pending.append(hedge["id"])
+                                self._waiters[hedge["id"]] = notified
+                                span.set(hedge_prediction_id=hedge["id"])
+                                logger.info(f"FASHN.ai prediction {prediction_id} passed p95, hedged with {hedge['id']}")
+
+                    if state:
+                        logger.info(f"FASHN.ai status: {state}, waiting...")
+
+                    # Sleep until the next sweep, a webhook notification, or the deadline
+                    wait = min(last_sweep + sweep_interval, deadline) - time.monotonic()
+                    try:
+                        await asyncio.wait_for(notified.wait(), timeout=max(wait, 0))
+                    except asyncio.TimeoutError:
+                        pass
+                    notified.clear()
+
+                raise TimeoutError(f"FASHN.ai generation timed out after {timeout_seconds} seconds")
+            finally:
+                # Losing or abandoned predictions no longer count as load
+                for pid in started:
+                    self._waiters.pop(pid, None)
+                    self._notifications.discard(pid)
+                    self._release_prediction(pid)
 
 
 # Singleton instance
@@ -0,0 +1,108 @@
+"""
+VirtualOutfit AI - Local FASHN.ai Stand-in
+
+A minimal stand-in for the FASHN.ai API, for exercising the backend (including the
+webhook completion path) without a real account or paid predictions.
+
+Implements:
+- POST /v1/run - Accepts a prediction, optionally with ?webhook_url=
+- GET /v1/status/{id} - Reports starting / processing / completed
+- GET /v1/outputs/{id} - Serves the "generated" image (the product image echoed back)
+
+Usage:
+    uvicorn fashn_stub:app --port 8001
+
+    FASHN_API_KEY=stub FASHN_BASE_URL=http://localhost:8001/v1 \\
+    FASHN_WEBHOOK_URL=http://localhost:8000/api/webhooks/fashn FASHN_WEBHOOK_SECRET=dev \\
+    uvicorn main:app --port 8000
+"""
+
+import os
+import time
+import uuid
+import base64
+import asyncio
+import logging
+from typing import Optional, Dict, Any
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request, Response
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Simulated prediction latency
+STUB_LATENCY_SECONDS = float(os.getenv("FASHN_STUB_LATENCY_SECONDS", 5))
+
+# Tiny placeholder JPEG header used when the product image was passed by URL
+PLACEHOLDER_IMAGE = base64.b64decode("/9j/4AAQSkZJRgABAQAAAQABAAD/2Q==")
+
+app = FastAPI(title="FASHN.ai Stand-in")
+
+_predictions: Dict[str, Dict[str, Any]] = {}
+
+
+def _status_payload(prediction_id: str, base_url: str) -> Dict[str, Any]:
+    prediction = _predictions[prediction_id]
+    elapsed = time.monotonic() - prediction["created_at"]
+    if elapsed >= STUB_LATENCY_SECONDS:
+        return {
+            "id": prediction_id,
+            "status": "completed",
+            "output": [f"{base_url}/v1/outputs/{prediction_id}"],
+            "error": None
+        }
+    return {
+        "id": prediction_id,
+        "status": "starting" if elapsed < 1 else "processing",
+        "output": None,
+        "error": None
+    }
+
+
+async def _notify(prediction_id: str, webhook_url: str, base_url: str):
+    """Call the webhook once the simulated prediction has finished."""
+    await asyncio.sleep(STUB_LATENCY_SECONDS)
+    payload = _status_payload(prediction_id, base_url)
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(webhook_url, json=payload, timeout=10.0)
+            logger.info(f"Webhook for {prediction_id} delivered: {response.status_code}")
+    except httpx.HTTPError as e:
+        logger.error(f"Webhook for {prediction_id} failed: {e}")
+
+
+@app.post("/v1/run")
+async def run(request: Request, webhook_url: Optional[str] = None):
+    if not request.headers.get("Authorization", "").startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing API key")
+
+    body = await request.json()
+    product_image = body.get("inputs", {}).get("product_image", "")
+    image_bytes = PLACEHOLDER_IMAGE
+    if product_image.startswith("data:"):
+        image_bytes = base64.b64decode(product_image.split(",", 1)[1])
+
+    prediction_id = uuid.uuid4().hex
+    _predictions[prediction_id] = {"created_at": time.monotonic(), "image": image_bytes}
+
+    if webhook_url:
+        base_url = str(request.base_url).rstrip("/")
+        asyncio.create_task(_notify(prediction_id, webhook_url, base_url))
+
+    return {"id": prediction_id, "error": None}
+
+
+@app.get("/v1/status/{prediction_id}")
+async def status(prediction_id: str, request: Request):
+    if prediction_id not in _predictions:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    return _status_payload(prediction_id, str(request.base_url).rstrip("/"))
+
+
+@app.get("/v1/outputs/{prediction_id}")
+async def output(prediction_id: str):
+    if prediction_id not in _predictions:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    return Response(content=_predictions[prediction_id]["image"], media_type="image/jpeg")
@@ -13,11 +13,12 @@ import os
 import base64
 import logging
 import httpx
-import asyncio
 from typing import Optional, Dict, Any
 
 from dotenv import load_dotenv
 from fashn_provider import get_fashn_provider, FashnProvider
+from tracing import get_tracer
+from speculative import get_speculative_ultra, speculation_key
 
 # Load environment variables
 load_dotenv()
@@ -46,7 +47,7 @@ def initialize_services():
     logger.info("Initializing FASHN.ai services...")
     try:
         provider = get_provider()
-        logger.info(f"FASHN.ai services initialized successfully (API key: {provider.api_key[:10]}...)")
+        logger.info(f"FASHN.ai services initialized successfully (API keys in pool: {len(provider.pool)})")
     except Exception as e:
         logger.warning(f"FASHN.ai initialization deferred: {e}")
         logger.warning("The server will start, but image generation will fail until API key is configured.")
@@ -101,6 +102,18 @@ async def analyze_outfit_image(
     return prompt
 
 
+async def download_image_base64(image_url: str) -> str:
+    """Download a generated image and return it base64-encoded."""
+    with get_tracer().span("pipeline.download") as span:
+        async with httpx.AsyncClient() as client:
+            img_response = await client.get(image_url, timeout=30.0)
+            span.set(http_status=img_response.status_code, bytes=len(img_response.content))
+            if img_response.status_code != 200:
+                raise ValueError(f"Failed to download generated image: {img_response.status_code}")
+            
+            return base64.b64encode(img_response.content).decode('utf-8')
+
+
 # ============================================
 # STEP 2: Preview Generation (FASHN.ai)
 # ============================================
@@ -138,14 +151,7 @@ async def generate_preview(
             raise ValueError("No images generated by FASHN.ai")
         
         # Download the first output image and convert to base64
-        image_url = output_images[0]
-        async with httpx.AsyncClient() as client:
-            img_response = await client.get(image_url, timeout=30.0)
-            if img_response.status_code != 200:
-                raise ValueError(f"Failed to download generated image: {img_response.status_code}")
-            
-            image_bytes = img_response.content
-            image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+        image_base64 = await download_image_base64(output_images[0])
         
         return {
             "image_base64": image_base64,
@@ -170,68 +176,98 @@ async def generate_ultra_quality(
 ) -> dict:
     """
     Step 3: Generate ultra-quality image using FASHN.ai with enhanced settings.
+    
+    Returns a speculatively pre-generated result instantly when one was
+    started for the same inputs (see speculate_ultra_quality).
     """
+    if image_base64_input:
+        parked = await get_speculative_ultra().claim(
+            speculation_key(prompt, aspect_ratio, image_base64_input)
+        )
+        if parked is not None:
+            return parked
+    
+    return await _run_ultra_quality(
+        prompt=prompt,
+        aspect_ratio=aspect_ratio,
+        negative_prompt=negative_prompt,
+        image_base64_input=image_base64_input
+    )
+
+
+async def _run_ultra_quality(
+    prompt: str,
+    aspect_ratio: str = "3:4",
+    negative_prompt: str = "",
+    image_base64_input: Optional[str] = None
+) -> dict:
+    """Run the ultra-quality FASHN.ai generation."""
     provider = get_provider()
     
     if image_base64_input:
         category = detect_category(prompt)
         
-        # Use enhanced settings for ultra quality
-        result = await provider.run_product_to_model(
+        # Wait for completion with longer timeout for ultra quality
+        result = await provider.generate_and_wait(
             product_image_base64=image_base64_input,
             prompt=prompt,
             category=category,
             mode="generate",
-            num_samples=1,
-            adjust_hands=True,  # Better hand positioning
-            restore_background=False
+            timeout_seconds=180,  # 3 minutes for ultra quality
+            poll_interval=5
         )
         
-        prediction_id = result.get("id")
-        if not prediction_id:
-            raise ValueError("No prediction ID returned from FASHN.ai")
-        
-        # Wait for completion with longer timeout for ultra quality
-        elapsed = 0
-        timeout_seconds = 180  # 3 minutes for ultra quality
-        poll_interval = 5
+        output_images = result.get("output", [])
+        if not output_images:
+            raise ValueError("No images generated by FASHN.ai")
         
-        while elapsed < timeout_seconds:
-            status = await provider.get_status(prediction_id)
-            state = status.get("status")
-            
-            if state == "completed":
-                output_images = status.get("output", [])
-                if not output_images:
-                    raise ValueError("No images generated by FASHN.ai")
-                
-                # Download and convert to base64
-                image_url = output_images[0]
-                async with httpx.AsyncClient() as client:
-                    img_response = await client.get(image_url, timeout=30.0)
-                    if img_response.status_code != 200:
-                        raise ValueError(f"Failed to download generated image: {img_response.status_code}")
-                    
-                    image_bytes = img_response.content
-                    image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-                
-                return {
-                    "image_base64": image_base64,
-                    "mime_type": "image/jpeg",
-                    "model_used": "fashn-product-to-model-ultra",
-                    "quality": "ultra"
-                }
-            elif state == "failed":
-                raise ValueError(f"FASHN.ai generation failed: {status.get('error', 'Unknown error')}")
-            
-            await asyncio.sleep(poll_interval)
-            elapsed += poll_interval
+        # Download and convert to base64
+        image_base64 = await download_image_base64(output_images[0])
         
-        raise TimeoutError("FASHN.ai ultra generation timed out")
+        return {
+            "image_base64": image_base64,
+            "mime_type": "image/jpeg",
+            "model_used": "fashn-product-to-model-ultra",
+            "quality": "ultra"
+        }
     else:
         raise ValueError("FASHN.ai requires a product image for ultra quality generation.")
 
 
+async def speculate_ultra_quality(
+    image_data: bytes,
+    mime_type: str = "image/jpeg",
+    product_description: str = "",
+    generation_type: str = "fashion",
+    aspect_ratio: str = "3:4"
+) -> str:
+    """
+    Start the ultra generation for a selected preview in the background.
+    
+    Uses the same prompt derivation as generate_outfit_image, so a later
+    ultra request for these inputs picks up the parked result.
+    
+    Returns:
+        "started", "exists", or the reason speculation was skipped
+    """
+    image_base64 = base64.b64encode(image_data).decode('utf-8')
+    prompt = await analyze_outfit_image(
+        image_data=image_data,
+        mime_type=mime_type,
+        product_description=product_description,
+        generation_type=generation_type
+    )
+    
+    return get_speculative_ultra().start(
+        speculation_key(prompt, aspect_ratio, image_base64),
+        lambda: _run_ultra_quality(
+            prompt=prompt,
+            aspect_ratio=aspect_ratio,
+            image_base64_input=image_base64
+        )
+    )
+
+
 # ============================================
 # Combined Pipeline Function
 # ============================================
@@ -276,18 +312,19 @@ async def generate_outfit_image(
     )
     
     # Generate with FASHN.ai
-    if quality == "ultra":
-        result = await generate_ultra_quality(
-            prompt=prompt,
-            aspect_ratio=aspect_ratio,
-            image_base64_input=image_base64
-        )
-    else:
-        result = await generate_preview(
-            prompt=prompt,
-            aspect_ratio=aspect_ratio,
-            image_base64_input=image_base64
-        )
+    with get_tracer().span("pipeline.generate_outfit_image", quality=quality, category=category):
+        if quality == "ultra":
+            result = await generate_ultra_quality(
+                prompt=prompt,
+                aspect_ratio=aspect_ratio,
+                image_base64_input=image_base64
+            )
+        else:
+            result = await generate_preview(
+                prompt=prompt,
+                aspect_ratio=aspect_ratio,
+                image_base64_input=image_base64
+            )
     
     # Add prompts to result
     result["base_prompt"] = prompt
@@ -0,0 +1,328 @@
+"""
+VirtualOutfit AI - Graceful Shutdown & In-flight Drain
+
+On redeploys, generations that are mid-way through a FASHN.ai prediction would
+otherwise be killed with the process, losing paid results. The drain controller:
+1. Tracks every running generation as a Job, including its FASHN.ai prediction ids
+2. On drain (SIGTERM or POST /admin/drain) flips readiness and rejects new generations
+3. Lets in-flight jobs finish until DRAIN_TIMEOUT_SECONDS
+4. Checkpoints Idempotency-Key jobs still running to DRAIN_CHECKPOINT_DIR, one file per
+   job, and deletes a job's file as soon as it finishes
+5. On the next startup, claims checkpoint files, resumes their jobs by re-attaching to
+   their predictions, and parks the results in the result store for the client's retry
+   under the same key
+"""
+
+import os
+import json
+import time
+import uuid
+import signal
+import asyncio
+import logging
+import contextvars
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Drain configuration
+DRAIN_TIMEOUT_SECONDS = float(os.getenv("DRAIN_TIMEOUT_SECONDS", 8))  # Below Cloud Run's 10s SIGTERM grace
+DRAIN_CHECKPOINT_DIR = os.getenv("DRAIN_CHECKPOINT_DIR", "inflight_checkpoints")
+DRAIN_ADMIN_TOKEN = os.getenv("DRAIN_ADMIN_TOKEN")
+DRAIN_RETRY_AFTER_SECONDS = 5
+
+_current_job: contextvars.ContextVar = contextvars.ContextVar("current_job", default=None)
+
+
+class DrainingError(RuntimeError):
+    """Raised when a new generation arrives while the server is draining."""
+
+
+class Job:
+    """A running generation, with enough detail to resume it after a restart."""
+
+    def __init__(
+        self,
+        endpoint: str,
+        store_key: Optional[str],
+        fingerprint: str,
+        params: Dict[str, Any],
+        resume_predictions: Optional[List[Dict[str, Any]]] = None
+    ):
+        self.job_id = uuid.uuid4().hex
+        self.endpoint = endpoint
+        # Result store key of an Idempotency-Key request; None for requests without a key
+        self.store_key = store_key
+        self.fingerprint = fingerprint
+        self.params = params
+        # [{"id": prediction_id, "key_index": index into the API key pool}]
+        self.predictions: List[Dict[str, Any]] = list(resume_predictions or [])
+        self.resume_predictions = resume_predictions
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "endpoint": self.endpoint,
+            "store_key": self.store_key,
+            "fingerprint": self.fingerprint,
+            "params": self.params,
+            "predictions": self.predictions,
+        }
+
+
+# ============================================
+# Provider Hooks
+# ============================================
+
+def record_prediction(prediction_id: str, key_index: int):
+    """Note a submitted prediction on the job running in this context."""
+    job = _current_job.get()
+    if job is not None:
+        job.predictions.append({"id": prediction_id, "key_index": key_index})
+
+
+def take_resume_predictions() -> Optional[List[Dict[str, Any]]]:
+    """Predictions a resumed job should wait on instead of submitting new ones."""
+    job = _current_job.get()
+    if job is None or not job.resume_predictions:
+        return None
+    predictions, job.resume_predictions = job.resume_predictions, None
+    return predictions
+
+
+# ============================================
+# Drain Controller
+# ============================================
+
+class DrainController:
+    """Tracks in-flight generations and drains them on shutdown."""
+
+    def __init__(
+        self,
+        timeout_seconds: float = DRAIN_TIMEOUT_SECONDS,
+        checkpoint_dir: str = DRAIN_CHECKPOINT_DIR
+    ):
+        self.timeout_seconds = timeout_seconds
+        self.checkpoint_dir = checkpoint_dir
+        self.draining = False
+        self._drain_started: Optional[float] = None
+        self._drain_task: Optional[asyncio.Task] = None
+        # job_id -> number of predictions in its checkpoint file
+        self._checkpointed: Dict[str, int] = {}
+        self._jobs: Dict[str, Job] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._jobs)
+
+    def check_accepting(self):
+        if self.draining:
+            raise DrainingError("Server is restarting, please retry shortly")
+
+    def wrap(self, job: Job, factory: Callable[[], Awaitable[Dict[str, Any]]]):
+        """Run factory() as a tracked job; its context lets the provider record predictions."""
+        async def run():
+            _current_job.set(job)
+            job.task = asyncio.current_task()
+            self._jobs[job.job_id] = job
+            try:
+                result = await factory()
+            except asyncio.CancelledError:
+                # Killed mid-drain: keep the job so it stays checkpointed
+                if not self.draining:
+                    self._jobs.pop(job.job_id, None)
+                raise
+            except Exception:
+                self._finish(job)
+                raise
+            self._finish(job)
+            return result
+        return run
+
+    def _finish(self, job: Job):
+        self._jobs.pop(job.job_id, None)
+        # Finished after the checkpoint: drop its file so a restart doesn't resume it
+        if job.job_id in self._checkpointed:
+            self._remove_checkpoint(job.job_id)
+
+    def begin_drain(self):
+        """Flip readiness and start draining in the background. Safe to call repeatedly."""
+        if self.draining:
+            return
+        self.draining = True
+        self._drain_started = time.monotonic()
+        logger.warning(f"Draining: {self.in_flight} generations in flight, deadline {self.timeout_seconds:.0f}s")
+        self._drain_task = asyncio.get_running_loop().create_task(self.drain())
+
+    async def drain(self):
+        """Wait for in-flight jobs until the deadline, then checkpoint the rest."""
+        if self._drain_task is not None and self._drain_task is not asyncio.current_task():
+            # Already draining in the background (SIGTERM or /admin/drain)
+            await self._drain_task
+            return
+
+        self.draining = True
+        if self._drain_started is None:
+            self._drain_started = time.monotonic()
+
+        remaining = self._drain_started + self.timeout_seconds - time.monotonic()
+        tasks = {job.task for job in self._jobs.values() if job.task and not job.task.done()}
+        if tasks and remaining > 0:
+            await asyncio.wait(tasks, timeout=remaining)
+
+        if self._jobs:
+            self.checkpoint()
+        else:
+            logger.info("Drain complete: no generations left in flight")
+
+    def _checkpoint_file(self, job_id: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"{job_id}.json")
+
+    def checkpoint(self):
+        """
+        Write each unfinished job to its own file so it completes after restart.
+
+        Only jobs with an Idempotency-Key and a submitted prediction are worth
+        resuming: nobody else can claim the result. One file per job means
+        instances draining together (e.g. a rolling redeploy) never overwrite
+        each other's checkpoints. Called at the drain deadline and again at
+        shutdown, which also drops files of jobs that finished meanwhile.
+        """
+        for job_id in [j for j in self._checkpointed if j not in self._jobs]:
+            self._remove_checkpoint(job_id)
+
+        jobs = [
+            job for job in self._jobs.values()
+            if job.store_key and job.predictions
+            and self._checkpointed.get(job.job_id) != len(job.predictions)
+        ]
+        if not jobs:
+            return
+
+        try:
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            for job in jobs:
+                path = self._checkpoint_file(job.job_id)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"created_at": time.time(), **job.to_dict()}, f)
+                os.replace(tmp_path, path)
+                self._checkpointed[job.job_id] = len(job.predictions)
+            logger.warning(f"Checkpointed {len(jobs)} unfinished generations to {self.checkpoint_dir}")
+        except OSError as e:
+            logger.error(f"Failed to checkpoint in-flight generations: {e}")
+
+    def _remove_checkpoint(self, job_id: str):
+        self._checkpointed.pop(job_id, None)
+        try:
+            os.remove(self._checkpoint_file(job_id))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Failed to remove drain checkpoint for job {job_id}: {e}")
+
+    def _claim_checkpoint(self, path: str) -> Optional[Dict[str, Any]]:
+        """Take a checkpoint file for this process; None if another instance got it first."""
+        claimed_path = f"{path}.claimed-{uuid.uuid4().hex}"
+        try:
+            # Atomic: exactly one starting instance wins each file
+            os.rename(path, claimed_path)
+        except OSError:
+            return None
+        try:
+            with open(claimed_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read drain checkpoint {path}: {e}")
+            return None
+        finally:
+            try:
+                os.remove(claimed_path)
+            except OSError:
+                pass
+
+    def install_signal_handler(self):
+        """
+        Start draining on SIGTERM, then hand the signal on to uvicorn.
+
+        uvicorn keeps serving open connections after SIGTERM, so in-flight
+        generations keep running while the drain deadline counts down.
+        """
+        loop = asyncio.get_running_loop()
+        previous = signal.getsignal(signal.SIGTERM)
+
+        def handler(signum, frame):
+            loop.call_soon_threadsafe(self.begin_drain)
+            if callable(previous):
+                previous(signum, frame)
+
+        try:
+            signal.signal(signal.SIGTERM, handler)
+        except ValueError:
+            # Not in the main thread (e.g. serverless runtime) - rely on /admin/drain
+            logger.info("SIGTERM drain handler not installed (not in main thread)")
+
+    def resume(
+        self,
+        store,
+        factories: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]]
+    ) -> int:
+        """
+        Resume jobs checkpointed by previous processes sharing the checkpoint directory.
+
+        Each file is claimed by atomic rename, so concurrently starting instances
+        never resume the same job twice. Each job re-attaches to its FASHN.ai predictions and its result is
+        parked in the result store under the Idempotency-Key the client retries with.
+        """
+        try:
+            names = sorted(os.listdir(self.checkpoint_dir))
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            logger.error(f"Failed to read drain checkpoints: {e}")
+            return 0
+
+        resumed = 0
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            data = self._claim_checkpoint(os.path.join(self.checkpoint_dir, name))
+            if data is None:
+                continue
+            factory = factories.get(data.get("endpoint"))
+            # Nothing submitted yet means nothing paid for - the client's retry starts fresh.
+            # Jobs without an Idempotency-Key have no retry that could safely claim the result.
+            if factory is None or not data.get("predictions") or not data.get("store_key"):
+                continue
+            job = Job(
+                endpoint=data["endpoint"],
+                store_key=data["store_key"],
+                fingerprint=data["fingerprint"],
+                params=data["params"],
+                resume_predictions=data.get("predictions") or None
+            )
+            store.start(job.store_key, job.fingerprint, self.wrap(job, lambda f=factory, p=job.params: f(p)))
+            resumed += 1
+
+        if resumed:
+            logger.info(f"Resumed {resumed} generations from drain checkpoints")
+        return resumed
+
+
+# Singleton instance
+_drain_controller: Optional[DrainController] = None
+
+
+def get_drain_controller() -> DrainController:
+    """Get or create the drain controller instance."""
+    global _drain_controller
+    if _drain_controller is None:
+        _drain_controller = DrainController()
+    return _drain_controller
@@ -9,6 +9,10 @@ Endpoints:
 - POST /api/generate/preview - Step 2: Preview generation (FASHN.ai)
 - POST /api/generate/ultra - Step 3: Ultra quality generation (FASHN.ai)
 - POST /api/generate - Combined pipeline (analyze + generate)
+- POST /api/generate/speculate - Start ultra in the background for a selected preview
+- POST /api/webhooks/fashn - FASHN.ai completion callback (webhook mode)
+- GET /api/metrics - Speculative ultra hit rate and spend
+- POST /admin/drain - Stop accepting generations ahead of a redeploy
 """
 
 import os
@@ -17,9 +21,10 @@ import logging
 from typing import Optional
 from io import BytesIO
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 
 from image_pipeline import (
@@ -27,11 +32,18 @@ from image_pipeline import (
     generate_preview,
     generate_ultra_quality,
     generate_outfit_image,
+    speculate_ultra_quality,
     initialize_services
 )
+from fashn_provider import get_fashn_provider
+from tracing import get_tracer, install_log_context
+from result_store import get_result_store, request_fingerprint, IdempotencyConflictError
+from speculative import get_speculative_ultra
+from lifecycle import get_drain_controller, Job, DrainingError, DRAIN_ADMIN_TOKEN, DRAIN_RETRY_AFTER_SECONDS, DRAIN_TIMEOUT_SECONDS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
+install_log_context()
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
@@ -48,9 +60,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id", "Idempotent-Replayed", "Retry-After"],
 )
 
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Open a trace per request so provider logs and spans can be correlated."""
+    with get_tracer().start_trace(
+        f"{request.method} {request.url.path}",
+        trace_id=request.headers.get("X-Trace-Id", "")[:64] or None
+    ) as trace:
+        response = await call_next(request)
+        response.headers["X-Trace-Id"] = trace.trace_id
+        return response
+
+
 # ============================================
 # Request/Response Models
 # ============================================
@@ -100,14 +125,129 @@ class FullGenerateResponse(BaseModel):
     enhanced_prompt: str
 
 
+class SpeculateResponse(BaseModel):
+    status: str  # started, exists, disabled, concurrency_limit, budget_exhausted, draining
+
+
+# ============================================
+# Generation Jobs
+# ============================================
+
+async def _run_preview(params: dict) -> dict:
+    return await generate_preview(
+        prompt=params["prompt"],
+        aspect_ratio=params["aspect_ratio"],
+        negative_prompt=params["negative_prompt"],
+        image_base64_input=params["image_base64"]
+    )
+
+
+async def _run_ultra(params: dict) -> dict:
+    return await generate_ultra_quality(
+        prompt=params["prompt"],
+        aspect_ratio=params["aspect_ratio"],
+        negative_prompt=params["negative_prompt"],
+        image_base64_input=params["image_base64"]
+    )
+
+
+async def _run_pipeline(params: dict) -> dict:
+    return await generate_outfit_image(
+        image_data=base64.b64decode(params["image_base64"]),
+        mime_type=params["mime_type"],
+        product_description=params["product_description"],
+        generation_type=params["generation_type"],
+        quality=params["quality"],
+        form_data=params.get("form_data"),
+        aspect_ratio=params["aspect_ratio"]
+    )
+
+
+# Endpoint -> generation, rebuilt from JSON params so checkpointed jobs can resume
+GENERATIONS = {
+    "preview": _run_preview,
+    "ultra": _run_ultra,
+    "generate": _run_pipeline,
+    "upload": _run_pipeline,
+}
+
+
+async def run_generation(
+    endpoint: str,
+    params: dict,
+    idempotency_key: Optional[str],
+    response: Response
+) -> dict:
+    """
+    Run a generation as a tracked job, once per Idempotency-Key.
+    
+    Retries with the same key attach to the running prediction or get the
+    stored result. Requests without a key always generate.
+    """
+    store = get_result_store()
+    drain = get_drain_controller()
+    fingerprint = request_fingerprint(params)
+    factory = lambda: GENERATIONS[endpoint](params)
+    
+    if not idempotency_key:
+        drain.check_accepting()
+        job = Job(endpoint, None, fingerprint, params)
+        return await drain.wrap(job, factory)()
+    
+    store_key = f"{endpoint}:{idempotency_key}"
+    if store.get(store_key) is None:
+        # Retries may still attach to running work while draining, new work may not
+        drain.check_accepting()
+    
+    job = Job(endpoint, store_key, fingerprint, params)
+    result, replayed = await store.run_once(store_key, fingerprint, drain.wrap(job, factory))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+def draining_error(e: DrainingError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(DRAIN_RETRY_AFTER_SECONDS)}
+    )
+
+
 # ============================================
 # Health Check
 # ============================================
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "service": "virtualoutfit-ai-backend"}
+    """Health check endpoint - reports not ready while draining"""
+    drain = get_drain_controller()
+    if drain.draining:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "draining",
+                "ready": False,
+                "in_flight": drain.in_flight,
+                "service": "virtualoutfit-ai-backend"
+            }
+        )
+    return {"status": "healthy", "ready": True, "service": "virtualoutfit-ai-backend"}
+
+
+@app.post("/admin/drain", status_code=202)
+async def admin_drain(admin_token: Optional[str] = Header(None, alias="X-Admin-Token")):
+    """
+    Start draining ahead of a redeploy (e.g. from a preStop hook).
+    """
+    if not DRAIN_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Drain endpoint is not configured")
+    if admin_token != DRAIN_ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    
+    drain = get_drain_controller()
+    drain.begin_drain()
+    return {"status": "draining", "in_flight": drain.in_flight}
 
 
 # ============================================
@@ -146,22 +286,25 @@ async def analyze_image(request: AnalyzeRequest):
 # ============================================
 
 @app.post("/api/generate/preview", response_model=GenerateResponse)
-async def generate_preview_image(request: GenerateRequest):
+async def generate_preview_image(
+    request: GenerateRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     Step 2: Generate preview image using Vertex AI Imagen.
     
     Note: image_base64 is optional and used for API compatibility.
     """
     try:
-        result = await generate_preview(
-            prompt=request.prompt,
-            aspect_ratio=request.aspect_ratio,
-            negative_prompt=request.negative_prompt,
-            image_base64_input=request.image_base64
-        )
+        result = await run_generation("preview", jsonable_encoder(request), idempotency_key, response)
         
         return GenerateResponse(**result)
         
+    except DrainingError as e:
+        raise draining_error(e)
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.error(f"Preview generation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -172,20 +315,23 @@ async def generate_preview_image(request: GenerateRequest):
 # ============================================
 
 @app.post("/api/generate/ultra", response_model=GenerateResponse)
-async def generate_ultra_image(request: GenerateRequest):
+async def generate_ultra_image(
+    request: GenerateRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     Step 3: Generate ultra-quality image using Vertex AI Imagen with enhanced prompts.
     """
     try:
-        result = await generate_ultra_quality(
-            prompt=request.prompt,
-            aspect_ratio=request.aspect_ratio,
-            negative_prompt=request.negative_prompt,
-            image_base64_input=request.image_base64
-        )
+        result = await run_generation("ultra", jsonable_encoder(request), idempotency_key, response)
         
         return GenerateResponse(**result)
         
+    except DrainingError as e:
+        raise draining_error(e)
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.error(f"Ultra generation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -196,43 +342,81 @@ async def generate_ultra_image(request: GenerateRequest):
 # ============================================
 
 @app.post("/api/generate", response_model=FullGenerateResponse)
-async def generate_full_pipeline(request: FullGenerateRequest):
+async def generate_full_pipeline(
+    request: FullGenerateRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     Combined pipeline: Analyze → Generate in one call.
     """
     try:
-        # Decode base64 image
+        # Run the full pipeline
+        result = await run_generation("generate", jsonable_encoder(request), idempotency_key, response)
+        
+        return FullGenerateResponse(**result)
+        
+    except DrainingError as e:
+        raise draining_error(e)
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Full pipeline failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============================================
+# Speculative Ultra Endpoint
+# ============================================
+
+@app.post("/api/generate/speculate", response_model=SpeculateResponse, status_code=202)
+async def speculate_ultra(request: FullGenerateRequest):
+    """
+    Start the ultra generation for a selected preview in the background.
+    
+    Send the same body as the upcoming quality="ultra" request; that request
+    then returns the parked result instead of waiting for a new prediction.
+    """
+    if get_drain_controller().draining:
+        return SpeculateResponse(status="draining")
+    
+    try:
         image_data = base64.b64decode(request.image_base64)
         
-        # Run the full pipeline
-        result = await generate_outfit_image(
+        status = await speculate_ultra_quality(
             image_data=image_data,
             mime_type=request.mime_type,
             product_description=request.product_description,
             generation_type=request.generation_type,
-            quality=request.quality,
-            form_data=request.form_data,
             aspect_ratio=request.aspect_ratio
         )
         
-        return FullGenerateResponse(**result)
+        return SpeculateResponse(status=status)
         
     except Exception as e:
-        logger.error(f"Full pipeline failed: {str(e)}")
+        logger.error(f"Speculative ultra failed to start: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/metrics")
+async def metrics():
+    """Speculative ultra hit rate and wasted spend"""
+    return {"speculative_ultra": get_speculative_ultra().metrics()}
+
+
 # ============================================
 # File Upload Endpoint (Alternative)
 # ============================================
 
 @app.post("/api/generate/upload")
 async def generate_from_upload(
+    response: Response,
     file: UploadFile = File(...),
     product_description: str = Form(""),
     generation_type: str = Form("fashion"),
     quality: str = Form("preview"),
     aspect_ratio: str = Form("3:4"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
     """
     Generate image from uploaded file.
@@ -243,22 +427,52 @@ async def generate_from_upload(
         mime_type = file.content_type or "image/jpeg"
         
         # Run the pipeline
-        result = await generate_outfit_image(
-            image_data=image_data,
-            mime_type=mime_type,
-            product_description=product_description,
-            generation_type=generation_type,
-            quality=quality,
-            aspect_ratio=aspect_ratio
-        )
+        params = {
+            "image_base64": base64.b64encode(image_data).decode('utf-8'),
+            "mime_type": mime_type,
+            "product_description": product_description,
+            "generation_type": generation_type,
+            "quality": quality,
+            "aspect_ratio": aspect_ratio
+        }
+        result = await run_generation("upload", params, idempotency_key, response)
         
-        return JSONResponse(content=result)
+        return result
         
+    except DrainingError as e:
+        raise draining_error(e)
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.error(f"Upload generation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ============================================
+# FASHN.ai Webhook Receiver
+# ============================================
+
+@app.post("/api/webhooks/fashn")
+async def fashn_webhook(request: Request, token: Optional[str] = None):
+    """
+    Receive FASHN.ai completion callbacks and resolve the waiting job.
+    """
+    provider = get_fashn_provider()
+    if not provider.verify_webhook_token(token):
+        raise HTTPException(status_code=401, detail="Invalid webhook token")
+    
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid webhook payload")
+    if not isinstance(payload, dict) or not payload.get("id"):
+        raise HTTPException(status_code=400, detail="Invalid webhook payload")
+    
+    matched = provider.resolve_webhook(payload)
+    logger.info(f"FASHN.ai webhook for {payload.get('id')}: {payload.get('status')} (matched: {matched})")
+    return {"received": True, "matched": matched}
+
+
 # ============================================
 # Startup Event
 # ============================================
@@ -268,9 +482,23 @@ async def startup_event():
     """Initialize backend services"""
     logger.info("Starting VirtualOutfit AI Backend...")
     initialize_services()
+    
+    drain = get_drain_controller()
+    drain.install_signal_handler()
+    drain.resume(get_result_store(), GENERATIONS)
     logger.info("Backend ready with FASHN.ai Product-to-Model!")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Drain in-flight generations and flush buffered trace spans before exit"""
+    drain = get_drain_controller()
+    await drain.drain()
+    # Connections are closed by now: checkpoint exactly what is still running (or remove the file)
+    drain.checkpoint()
+    get_tracer().flush()
+
+
 # ============================================
 # Run the server
 # ============================================
@@ -283,5 +511,7 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=port,
-        reload=True
+        reload=True,
+        # Leave room for the drain deadline before open connections are dropped
+        timeout_graceful_shutdown=int(DRAIN_TIMEOUT_SECONDS) + 5
     )
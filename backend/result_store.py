@@ -0,0 +1,192 @@
+"""
+VirtualOutfit AI - Generation Result Store
+
+Keeps running generation tasks and their finished results in memory, keyed by a
+client-supplied key (e.g. an Idempotency-Key header). A retry with the same key
+attaches to the running task or gets the stored result instead of starting a new
+paid FASHN.ai prediction.
+
+Tasks are shielded from the request that started them, so a dropped connection
+does not cancel the prediction behind it. Finished results hold full output images,
+so the store is capped by entry count and by total result size.
+"""
+
+import os
+import time
+import json
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple
+
+from dotenv import load_dotenv
+from tracing import current_trace_id, set_request_attributes
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Result store configuration
+RESULT_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 600))
+RESULT_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", 50))
+RESULT_MAX_BYTES = int(os.getenv("IDEMPOTENCY_MAX_MB", 100)) * 1024 * 1024
+
+
+class IdempotencyConflictError(ValueError):
+    """Raised when a key is reused with a different request payload."""
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """Stable hash of the request inputs a stored result was produced from."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            digest.update(part)
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _result_size(result: Any) -> int:
+    """Approximate memory held by a result (dominated by base64 image strings)."""
+    if isinstance(result, dict):
+        return sum(_result_size(value) for value in result.values())
+    if isinstance(result, (list, tuple)):
+        return sum(_result_size(value) for value in result)
+    if isinstance(result, (str, bytes)):
+        return len(result)
+    return 0
+
+
+class StoredResult:
+    """A generation task (running or finished) stored under a key."""
+
+    def __init__(self, fingerprint: str, task: asyncio.Task):
+        self.fingerprint = fingerprint
+        self.task = task
+        self.created_at = time.monotonic()
+        # Trace of the request that started the task, so replays can point back to it
+        self.trace_id = current_trace_id()
+        self.size = 0
+
+    def expired(self, ttl_seconds: float) -> bool:
+        # Running tasks never expire; retries must always be able to attach
+        return self.task.done() and time.monotonic() - self.created_at > ttl_seconds
+
+
+class ResultStore:
+    """In-memory map of key -> generation task with a retention window."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = RESULT_TTL_SECONDS,
+        max_entries: int = RESULT_MAX_ENTRIES,
+        max_bytes: int = RESULT_MAX_BYTES,
+        on_expire: Optional[Callable[[str, StoredResult], None]] = None
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Called for results dropped by the retention window or capacity limit
+        self.on_expire = on_expire
+        self._entries: "OrderedDict[str, StoredResult]" = OrderedDict()
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        if self.on_expire:
+            self.on_expire(key, entry)
+
+    def purge(self):
+        """Drop results past the retention window or over capacity."""
+        for key in [k for k, e in self._entries.items() if e.expired(self.ttl_seconds)]:
+            self._drop(key)
+        # Over capacity: drop the oldest finished results first
+        while len(self._entries) > self.max_entries or self.total_bytes() > self.max_bytes:
+            oldest = next((k for k, e in self._entries.items() if e.task.done()), None)
+            if oldest is None:
+                break
+            self._drop(oldest)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def total_bytes(self) -> int:
+        return sum(entry.size for entry in self._entries.values())
+
+    def get(self, key: str) -> Optional[StoredResult]:
+        self.purge()
+        return self._entries.get(key)
+
+    def pop(self, key: str) -> Optional[StoredResult]:
+        """Remove and return an entry, e.g. when its result is handed to its one consumer."""
+        self.purge()
+        return self._entries.pop(key, None)
+
+    def start(
+        self,
+        key: str,
+        fingerprint: str,
+        factory: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> StoredResult:
+        """Start factory() as a background task stored under key."""
+        entry = StoredResult(fingerprint, asyncio.create_task(factory()))
+        entry.task.add_done_callback(self._on_done(key, entry))
+        self._entries[key] = entry
+        return entry
+
+    def _on_done(self, key: str, entry: StoredResult):
+        def callback(task: asyncio.Task):
+            # Failed generations are not stored so a retry can try again
+            if task.cancelled() or task.exception() is not None:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                return
+            entry.size = _result_size(task.result())
+            self.purge()
+        return callback
+
+    async def run_once(
+        self,
+        key: str,
+        fingerprint: str,
+        factory: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Run factory() at most once per key within the retention window.
+
+        Returns:
+            (result, replayed) - replayed is True when the result came from an
+            earlier request with the same key
+        """
+        entry = self.get(key)
+        replayed = entry is not None
+
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyConflictError("Idempotency-Key was already used with a different request")
+            logger.info(
+                f"Idempotency-Key {key} matched a {'finished' if entry.task.done() else 'running'} "
+                f"generation (trace: {entry.trace_id})"
+            )
+            set_request_attributes(idempotent_replay=True, origin_trace_id=entry.trace_id)
+        else:
+            entry = self.start(key, fingerprint, factory)
+
+        return await asyncio.shield(entry.task), replayed
+
+
+# Singleton instance
+_result_store: Optional[ResultStore] = None
+
+
+def get_result_store() -> ResultStore:
+    """Get or create the result store instance."""
+    global _result_store
+    if _result_store is None:
+        _result_store = ResultStore()
+    return _result_store
@@ -0,0 +1,203 @@
+"""
+VirtualOutfit AI - Speculative Ultra Pre-generation
+
+Users who select a preview usually press "Download HD" within seconds. When enabled,
+the backend starts the ultra prediction as soon as a preview is selected and parks the
+result in a result store, so the real ultra request returns immediately.
+
+Speculation only runs while under the configured budget:
+- SPECULATIVE_ULTRA_MAX_CONCURRENT - speculative predictions running at once
+- SPECULATIVE_ULTRA_BUDGET_USD - spend on speculation per rolling hour
+
+Hit rate and wasted spend (parked results nobody claimed) are tracked for /api/metrics.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import contextvars
+from collections import deque
+from typing import Optional, Dict, Any, Callable, Awaitable
+
+from dotenv import load_dotenv
+from result_store import ResultStore, StoredResult, request_fingerprint
+from tracing import set_request_attributes
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Speculation configuration
+SPECULATIVE_ENABLED = os.getenv("SPECULATIVE_ULTRA_ENABLED", "false").lower() == "true"
+SPECULATIVE_MAX_CONCURRENT = int(os.getenv("SPECULATIVE_ULTRA_MAX_CONCURRENT", 2))
+SPECULATIVE_BUDGET_USD = float(os.getenv("SPECULATIVE_ULTRA_BUDGET_USD", 1.0))  # Per rolling hour
+SPECULATIVE_TTL_SECONDS = int(os.getenv("SPECULATIVE_ULTRA_TTL_SECONDS", 600))
+ULTRA_COST_USD = float(os.getenv("ULTRA_COST_USD", 0.08))
+
+BUDGET_WINDOW_SECONDS = 3600
+
+# Called by the provider when a speculative generation submits a prediction
+_spend_hook: contextvars.ContextVar = contextvars.ContextVar("speculative_spend_hook", default=None)
+
+
+def speculation_key(prompt: str, aspect_ratio: str, image_base64: str) -> str:
+    """Key an ultra generation by the inputs that determine its output."""
+    return request_fingerprint("ultra", prompt, aspect_ratio, image_base64)
+
+
+def record_speculative_spend():
+    """Charge a submitted FASHN.ai prediction to the speculation running in this context."""
+    hook = _spend_hook.get()
+    if hook is not None:
+        hook()
+
+
+class SpeculativeUltra:
+    """Budgeted background ultra generations, claimed by the real ultra request."""
+
+    def __init__(
+        self,
+        enabled: bool = SPECULATIVE_ENABLED,
+        max_concurrent: int = SPECULATIVE_MAX_CONCURRENT,
+        budget_usd: float = SPECULATIVE_BUDGET_USD,
+        ttl_seconds: float = SPECULATIVE_TTL_SECONDS,
+        cost_usd: float = ULTRA_COST_USD
+    ):
+        self.enabled = enabled
+        self.max_concurrent = max_concurrent
+        self.budget_usd = budget_usd
+        self.cost_usd = cost_usd
+        self.store = ResultStore(ttl_seconds=ttl_seconds, on_expire=self._on_expire)
+
+        self._running = 0
+        # Started speculations that have not submitted a prediction yet (budget held back for them)
+        self._reserved = 0
+        self._spend: deque = deque()  # (timestamp, cost) of submitted speculative predictions
+
+        # Metrics
+        self.started = 0
+        self.skipped_budget = 0
+        self.skipped_concurrency = 0
+        self.failed = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+
+    def _spend_in_window(self) -> float:
+        cutoff = time.monotonic() - BUDGET_WINDOW_SECONDS
+        while self._spend and self._spend[0][0] < cutoff:
+            self._spend.popleft()
+        return sum(cost for _, cost in self._spend)
+
+    def _on_expire(self, key: str, entry: StoredResult):
+        # Only successful results stay in the store, so anything expiring was paid for and unused
+        self.wasted += 1
+        logger.info(f"Speculative ultra result expired unclaimed (key: {key[:12]})")
+
+    def start(self, key: str, factory: Callable[[], Awaitable[Dict[str, Any]]]) -> str:
+        """
+        Start a speculative ultra generation if the budget allows.
+
+        Returns:
+            "started", "exists", or the reason it was skipped
+        """
+        if not self.enabled:
+            return "disabled"
+        if self.store.get(key) is not None:
+            return "exists"
+        if self._running >= self.max_concurrent:
+            self.skipped_concurrency += 1
+            return "concurrency_limit"
+        if self._spend_in_window() + self.cost_usd * (self._reserved + 1) > self.budget_usd:
+            self.skipped_budget += 1
+            return "budget_exhausted"
+
+        async def run():
+            submitted = False
+
+            def on_submit():
+                # Spend counts only once FASHN.ai has accepted a prediction
+                nonlocal submitted
+                if not submitted:
+                    submitted = True
+                    self._reserved -= 1
+                self._spend.append((time.monotonic(), self.cost_usd))
+
+            _spend_hook.set(on_submit)
+            try:
+                return await factory()
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Speculative ultra generation failed: {e}")
+                raise
+            finally:
+                self._running -= 1
+                if not submitted:
+                    self._reserved -= 1
+
+        self._running += 1
+        self._reserved += 1
+        self.started += 1
+        self.store.start(key, key, run)
+        logger.info(f"Started speculative ultra generation (key: {key[:12]})")
+        return "started"
+
+    async def claim(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Take the parked (or still running) speculative result for key.
+
+        Returns None when there is nothing usable, so the caller generates normally.
+        """
+        if not self.enabled:
+            return None
+
+        entry = self.store.pop(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        try:
+            result = await asyncio.shield(entry.task)
+        except Exception:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        set_request_attributes(speculative_hit=True, origin_trace_id=entry.trace_id)
+        logger.info(f"Speculative ultra hit (key: {key[:12]}, trace: {entry.trace_id})")
+        return dict(result)
+
+    def metrics(self) -> Dict[str, Any]:
+        self.store.purge()
+        return {
+            "enabled": self.enabled,
+            "started": self.started,
+            "running": self._running,
+            "parked": len(self.store),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / self.started, 3) if self.started else 0.0,
+            "failed": self.failed,
+            "skipped_budget": self.skipped_budget,
+            "skipped_concurrency": self.skipped_concurrency,
+            "wasted": self.wasted,
+            "wasted_spend_usd": round(self.wasted * self.cost_usd, 2),
+            "spend_last_hour_usd": round(self._spend_in_window(), 2),
+            "budget_usd_per_hour": self.budget_usd
+        }
+
+
+# Singleton instance
+_speculative_ultra: Optional[SpeculativeUltra] = None
+
+
+def get_speculative_ultra() -> SpeculativeUltra:
+    """Get or create the speculative ultra instance."""
+    global _speculative_ultra
+    if _speculative_ultra is None:
+        _speculative_ultra = SpeculativeUltra()
+    return _speculative_ultra
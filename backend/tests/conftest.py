@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Backend modules import each other as top-level modules (e.g. "from tracing import ...")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Configures the environment before any backend module is imported
+import stub_harness  # noqa: E402,F401
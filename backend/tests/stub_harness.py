@@ -0,0 +1,80 @@
+"""
+In-process test harness: the local FASHN.ai stand-in (fashn_stub.py) and the backend,
+each served by uvicorn on a free port inside the test's event loop.
+
+Imported by conftest.py before any backend module, because the backend reads its
+configuration from the environment at import time.
+"""
+
+import os
+import socket
+import asyncio
+import tempfile
+from contextlib import asynccontextmanager
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+STUB_PORT = _free_port()
+APP_PORT = _free_port()
+os.environ.update({
+    "FASHN_API_KEY": "stub",
+    "FASHN_API_KEYS": "",
+    "FASHN_BASE_URL": f"http://127.0.0.1:{STUB_PORT}/v1",
+    "FASHN_WEBHOOK_URL": f"http://127.0.0.1:{APP_PORT}/api/webhooks/fashn",
+    "FASHN_WEBHOOK_SECRET": "test-secret",
+    "FASHN_WEBHOOK_SWEEP_INTERVAL": "30",
+    "FASHN_STUB_LATENCY_SECONDS": "1",
+    "TRACE_EXPORT_PATH": "",
+    "DRAIN_CHECKPOINT_DIR": tempfile.mkdtemp(),
+})
+
+import uvicorn  # noqa: E402
+
+# 1x1 JPEG, enough for the stand-in to echo back
+IMAGE_BASE64 = "/9j/4AAQSkZJRgABAQAAAQABAAD/2Q=="
+
+
+async def _serve(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    server.install_signal_handlers = lambda: None
+    asyncio.get_running_loop().create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server
+
+
+@asynccontextmanager
+async def stub_servers():
+    """Serve the stand-in provider and the backend (webhook receiver) for one test."""
+    import fashn_stub
+    import main
+
+    stub = await _serve(fashn_stub.app, STUB_PORT)
+    app = await _serve(main.app, APP_PORT)
+    try:
+        yield
+    finally:
+        app.should_exit = True
+        stub.should_exit = True
+        await asyncio.sleep(0.2)
+
+
+def stub_submissions() -> int:
+    """Predictions submitted to the stand-in so far (i.e. paid predictions)."""
+    import fashn_stub
+    return len(fashn_stub._predictions)
+
+
+async def generate(timeout_seconds: int = 20, poll_interval: int = 1):
+    """One generation through the real provider against the stand-in."""
+    from fashn_provider import get_fashn_provider
+    return await get_fashn_provider().generate_and_wait(
+        product_image_base64=IMAGE_BASE64,
+        timeout_seconds=timeout_seconds,
+        poll_interval=poll_interval
+    )
@@ -0,0 +1,112 @@
+"""
+Drain checkpoint and resume (DrainController), against the local FASHN.ai stand-in.
+"""
+
+import os
+import asyncio
+
+import pytest
+
+import fashn_stub
+from stub_harness import generate, stub_servers, stub_submissions
+from lifecycle import DrainController, Job
+from result_store import ResultStore
+
+PARAMS = {"prompt": "shirt"}
+
+
+@pytest.fixture
+def slow_stub(monkeypatch):
+    # Predictions outlive the drain deadline
+    monkeypatch.setattr(fashn_stub, "STUB_LATENCY_SECONDS", 3)
+
+
+def _checkpoint_files(directory) -> list:
+    return sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+
+
+def _start_job(drain: DrainController, store: ResultStore, store_key):
+    job = Job("preview", store_key, "fp", PARAMS)
+    if store_key is None:
+        task = asyncio.create_task(drain.wrap(job, generate)())
+    else:
+        task = store.start(store_key, "fp", drain.wrap(job, generate)).task
+    return job, task
+
+
+async def _submitted(job: Job):
+    while not job.predictions:
+        await asyncio.sleep(0.05)
+
+
+def test_checkpoint_written_at_deadline_and_removed_on_finish(tmp_path, slow_stub):
+    async def scenario():
+        async with stub_servers():
+            drain = DrainController(timeout_seconds=0.5, checkpoint_dir=str(tmp_path))
+            store = ResultStore()
+            keyed, keyed_task = _start_job(drain, store, "preview:k")
+            keyless, keyless_task = _start_job(drain, store, None)
+            await _submitted(keyed)
+            await _submitted(keyless)
+
+            await drain.drain()
+            # Only the Idempotency-Key job is worth resuming
+            assert _checkpoint_files(tmp_path) == [f"{keyed.job_id}.json"]
+
+            result = await keyed_task
+            await keyless_task
+            assert result["status"] == "completed"
+            assert _checkpoint_files(tmp_path) == []
+
+    asyncio.run(scenario())
+
+
+def test_instances_draining_together_keep_their_own_checkpoints(tmp_path, slow_stub):
+    async def scenario():
+        async with stub_servers():
+            first = DrainController(timeout_seconds=0.2, checkpoint_dir=str(tmp_path))
+            second = DrainController(timeout_seconds=0.2, checkpoint_dir=str(tmp_path))
+            store = ResultStore()
+            job_a, task_a = _start_job(first, store, "preview:a")
+            job_b, task_b = _start_job(second, store, "preview:b")
+            await _submitted(job_a)
+            await _submitted(job_b)
+
+            await asyncio.gather(first.drain(), second.drain())
+            assert _checkpoint_files(tmp_path) == sorted([f"{job_a.job_id}.json", f"{job_b.job_id}.json"])
+            await asyncio.gather(task_a, task_b)
+
+    asyncio.run(scenario())
+
+
+def test_resume_reattaches_without_new_prediction(tmp_path, slow_stub):
+    async def scenario():
+        async with stub_servers():
+            old = DrainController(timeout_seconds=0.2, checkpoint_dir=str(tmp_path))
+            job, task = _start_job(old, ResultStore(), "preview:k")
+            await _submitted(job)
+            await old.drain()
+
+            # The old process dies with the job still running
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert _checkpoint_files(tmp_path) == [f"{job.job_id}.json"]
+
+            before = stub_submissions()
+            new = DrainController(checkpoint_dir=str(tmp_path))
+            store = ResultStore()
+            assert new.resume(store, {"preview": lambda params: generate()}) == 1
+            assert _checkpoint_files(tmp_path) == []
+
+            # The client's retry with the same key gets the resumed result
+            result, replayed = await store.run_once("preview:k", "fp", generate)
+            assert replayed
+            assert result["status"] == "completed"
+            assert result["id"] == job.predictions[0]["id"]
+            assert stub_submissions() == before
+
+            # A second instance starting later finds nothing left to claim
+            assert DrainController(checkpoint_dir=str(tmp_path)).resume(ResultStore(), {}) == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,46 @@
+"""
+Webhook completion against the local FASHN.ai stand-in (fashn_stub.py).
+
+Submits a prediction with a callback URL and checks the job is resolved by the
+callback well before the fallback sweep would have polled.
+"""
+
+import asyncio
+
+import httpx
+
+from stub_harness import APP_PORT, STUB_PORT, IMAGE_BASE64, stub_servers
+from fashn_provider import get_fashn_provider
+
+
+async def _run_webhook_flow():
+    async with stub_servers():
+        provider = get_fashn_provider()
+        assert provider.webhook_url
+
+        # Callbacks without the shared secret are rejected
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"http://127.0.0.1:{APP_PORT}/api/webhooks/fashn?token=wrong",
+                json={"id": "x", "status": "completed", "output": ["http://evil.example/x.jpg"]}
+            )
+        assert response.status_code == 401
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await provider.generate_and_wait(
+            product_image_base64=IMAGE_BASE64,
+            timeout_seconds=20,
+            poll_interval=10
+        )
+        elapsed = loop.time() - started
+
+        assert result["status"] == "completed"
+        assert result["output"][0].startswith(f"http://127.0.0.1:{STUB_PORT}/v1/outputs/")
+        # Resolved by the callback, not by the first poll (10s) or sweep (30s)
+        assert elapsed < 5
+        assert provider._webhook_deliveries[-1] is True
+
+
+def test_webhook_resolves_waiting_job():
+    asyncio.run(_run_webhook_flow())
@@ -0,0 +1,98 @@
+"""
+Idempotent generations through ResultStore.run_once, against the local FASHN.ai stand-in.
+"""
+
+import asyncio
+
+import pytest
+
+from stub_harness import generate, stub_servers, stub_submissions
+from result_store import ResultStore, IdempotencyConflictError
+
+
+def test_retry_attaches_to_running_generation():
+    async def scenario():
+        async with stub_servers():
+            store = ResultStore()
+            before = stub_submissions()
+            first, second = await asyncio.gather(
+                store.run_once("k", "fp", generate),
+                store.run_once("k", "fp", generate),
+            )
+            assert stub_submissions() - before == 1
+            assert first[0] == second[0]
+            assert sorted([first[1], second[1]]) == [False, True]
+
+    asyncio.run(scenario())
+
+
+def test_finished_result_is_replayed_without_new_prediction():
+    async def scenario():
+        async with stub_servers():
+            store = ResultStore()
+            result, replayed = await store.run_once("k", "fp", generate)
+            assert not replayed
+
+            before = stub_submissions()
+            again, replayed = await store.run_once("k", "fp", generate)
+            assert replayed
+            assert again == result
+            assert stub_submissions() == before
+
+    asyncio.run(scenario())
+
+
+def test_key_reused_with_different_request_conflicts():
+    async def scenario():
+        async with stub_servers():
+            store = ResultStore()
+            await store.run_once("k", "fp", generate)
+            with pytest.raises(IdempotencyConflictError):
+                await store.run_once("k", "other", generate)
+
+    asyncio.run(scenario())
+
+
+def test_failed_generation_is_not_stored():
+    async def scenario():
+        async with stub_servers():
+            store = ResultStore()
+
+            async def failing():
+                raise ValueError("FASHN.ai generation failed")
+
+            with pytest.raises(ValueError):
+                await store.run_once("k", "fp", failing)
+            await asyncio.sleep(0)
+            assert store.get("k") is None
+
+            # The retry with the same key generates for real
+            before = stub_submissions()
+            result, replayed = await store.run_once("k", "fp", generate)
+            assert not replayed
+            assert result["status"] == "completed"
+            assert stub_submissions() - before == 1
+
+    asyncio.run(scenario())
+
+
+def test_oldest_results_evicted_by_total_size():
+    async def scenario():
+        async with stub_servers():
+            store = ResultStore()
+            await store.run_once("a", "fp", generate)
+            size = store.get("a").size
+            assert size > 0
+
+            # Room for one result: storing a second evicts the first
+            store.max_bytes = size + size // 2
+            await store.run_once("b", "fp", generate)
+            assert store.get("a") is None
+            assert store.get("b") is not None
+
+            before = stub_submissions()
+            _, replayed = await store.run_once("a", "fp", generate)
+            assert not replayed
+            assert stub_submissions() - before == 1
+
+    asyncio.run(scenario())
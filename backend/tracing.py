@@ -0,0 +1,299 @@
+"""
+VirtualOutfit AI - Request Tracing
+
+Lightweight in-process tracing for the generation pipeline:
+1. Trace Context - A trace id is created per HTTP request and carried in a contextvar
+2. Spans - Timed spans around FASHN.ai calls (run, status polls, downloads)
+3. Export - Finished spans go to a bounded buffer and are flushed to a local JSONL file
+4. Slow Requests - Requests over the threshold have their full span tree logged
+
+Context variables follow the request through awaits and into tasks spawned from it,
+so nothing has to be passed explicitly through the pipeline functions.
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tracing configuration
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() == "true"
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", 10000))
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "traces.jsonl")
+TRACE_EXPORT_BATCH = int(os.getenv("TRACE_EXPORT_BATCH", 200))
+TRACE_SLOW_REQUEST_MS = float(os.getenv("TRACE_SLOW_REQUEST_MS", 90000))
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+# ============================================
+# Span / Trace Records
+# ============================================
+
+class Span:
+    """A single timed operation within a trace."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_time",
+                 "_start", "duration_ms", "attributes", "error")
+
+    def __init__(self, trace_id: str, name: str, parent_id: Optional[str] = None, **attributes):
+        self.trace_id = trace_id
+        self.span_id = _new_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.attributes: Dict[str, Any] = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        """Attach attributes (e.g. prediction_id) once they are known."""
+        self.attributes.update(attributes)
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration_ms or 0.0, 2),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """All spans recorded for one request."""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+        self.root: Optional[Span] = None
+        # Set once the request is done; later spans (e.g. from a shielded task) export on their own
+        self.finished = False
+
+    def render_tree(self) -> str:
+        """Render the span tree as indented text for the slow-request log."""
+        children: Dict[Optional[str], List[Span]] = {}
+        for span in self.spans:
+            children.setdefault(span.parent_id, []).append(span)
+
+        lines = []
+
+        def walk(parent_id: Optional[str], depth: int):
+            for span in sorted(children.get(parent_id, []), key=lambda s: s.start_time):
+                attrs = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+                error = f" ERROR={span.error}" if span.error else ""
+                lines.append(f"{'  ' * depth}{span.name} {span.duration_ms or 0.0:.1f}ms {attrs}{error}".rstrip())
+                walk(span.span_id, depth + 1)
+
+        walk(None, 0)
+        return "\n".join(lines)
+
+
+# ============================================
+# Tracer
+# ============================================
+
+class Tracer:
+    """Records spans into a bounded buffer and exports them to a JSONL file."""
+
+    def __init__(
+        self,
+        enabled: bool = TRACE_ENABLED,
+        buffer_size: int = TRACE_BUFFER_SIZE,
+        export_path: str = TRACE_EXPORT_PATH,
+        export_batch: int = TRACE_EXPORT_BATCH,
+        slow_request_ms: float = TRACE_SLOW_REQUEST_MS
+    ):
+        self.enabled = enabled
+        self.export_path = export_path
+        self.export_batch = export_batch
+        self.slow_request_ms = slow_request_ms
+        # Spans wait here while a batch is being written; the oldest are dropped
+        # if export falls behind by more than buffer_size spans
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._writing = False
+        self.dropped_spans = 0
+
+    @contextmanager
+    def start_trace(self, name: str, trace_id: Optional[str] = None, **attributes):
+        """Open a new trace with a root span. Used once per HTTP request."""
+        trace = Trace(trace_id or _new_id())
+        trace_token = _current_trace.set(trace)
+        root = None
+        try:
+            with self.span(name, **attributes) as root:
+                if isinstance(root, Span):
+                    trace.root = root
+                yield trace
+        finally:
+            # Finish while the trace is still current so the slow-request log carries its id
+            if self.enabled and isinstance(root, Span):
+                self._finish_trace(trace, root)
+            _current_trace.reset(trace_token)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time a block of work as a child of the current span."""
+        trace = _current_trace.get()
+        if not self.enabled or trace is None:
+            yield _NOOP_SPAN
+            return
+
+        span = Span(trace.trace_id, name, parent_id=_current_span.get(), **attributes)
+        span_token = _current_span.set(span.span_id)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.finish()
+            _current_span.reset(span_token)
+            if trace.finished:
+                self._record([span])
+            else:
+                trace.spans.append(span)
+
+    def _finish_trace(self, trace: Trace, root: Span):
+        if root.duration_ms is not None and root.duration_ms >= self.slow_request_ms:
+            logger.warning(
+                f"Slow request {root.name} took {root.duration_ms:.0f}ms "
+                f"(trace: {trace.trace_id})\n{trace.render_tree()}"
+            )
+        trace.finished = True
+        self._record(trace.spans)
+
+    def _record(self, spans: List[Span]):
+        with self._lock:
+            overflow = len(self._buffer) + len(spans) - self._buffer.maxlen
+            if overflow > 0:
+                self.dropped_spans += overflow
+            self._buffer.extend(spans)
+            # Only one batch is written at a time; spans keep buffering meanwhile
+            if len(self._buffer) < self.export_batch or self._writing:
+                return
+            self._writing = True
+            spans = self._take_buffer()
+
+        # Keep file I/O off the event loop
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_batch(spans)
+        else:
+            loop.run_in_executor(None, self._write_batch, spans)
+
+    def _take_buffer(self) -> List[Span]:
+        spans = list(self._buffer)
+        self._buffer.clear()
+        return spans
+
+    def _write_batch(self, spans: List[Span]):
+        try:
+            self._write(spans)
+        finally:
+            with self._lock:
+                self._writing = False
+
+    def _write(self, spans: List[Span]):
+        if not spans or not self.export_path:
+            return
+        try:
+            with self._write_lock, open(self.export_path, "a", encoding="utf-8") as f:
+                for span in spans:
+                    f.write(json.dumps(span.to_dict(), default=str) + "\n")
+        except OSError as e:
+            logger.error(f"Failed to export traces to {self.export_path}: {e}")
+
+    def flush(self):
+        """Write all buffered spans to the export file (blocking; used at shutdown)."""
+        with self._lock:
+            spans = self._take_buffer()
+        self._write(spans)
+        if self.dropped_spans:
+            logger.warning(f"Trace export fell behind; {self.dropped_spans} spans were dropped")
+
+
+class _NoopSpan:
+    """Stand-in yielded when tracing is disabled or no trace is active."""
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def current_trace_id() -> Optional[str]:
+    """Trace id of the request being handled, if any."""
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def set_request_attributes(**attributes):
+    """Attach attributes to the root span of the request being handled, if any."""
+    trace = _current_trace.get()
+    if trace is not None and trace.root is not None:
+        trace.root.set(**attributes)
+
+
+# ============================================
+# Log Correlation
+# ============================================
+
+class TraceContextFilter(logging.Filter):
+    """Adds the current trace id to every log record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id() or "-"
+        return True
+
+
+def install_log_context():
+    """Include the trace id in all log lines emitted through the root handlers."""
+    formatter = logging.Formatter("%(levelname)s:%(name)s:[trace %(trace_id)s] %(message)s")
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(TraceContextFilter())
+        handler.setFormatter(formatter)
+
+
+# Singleton instance
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """Get or create the tracer instance."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
@@ -5,7 +5,7 @@ import { toast } from 'sonner';
 import { motion, AnimatePresence } from 'motion/react';
 import { generatePreview as generateImageBackend } from '../utils/backend-api';
 import { getGeminiApiKey } from '../utils/gemini-api';
-import { generateImage, checkBackendHealth } from '../utils/backend-api';
+import { generateImage, speculateUltra, checkBackendHealth, FullGenerateRequest } from '../utils/backend-api';
 import { ColorPicker, ColorState } from './ColorPicker';
 import { supabase } from '../utils/supabase';
 import { GenerationProgress } from './ui/GenerationProgress';
@@ -643,7 +643,7 @@ export function GeneratorHub() {
       };
 
       setGeneratedImages([newImage, ...generatedImages]);
-      setSelectedResult(newImage); // Auto-select the new image
+      setSelectedResult(newImage); // Auto-select the new image (no HD pre-generation for automatic selection)
       setIsGenerating(false);
       setGenerationStep(null);
 
@@ -902,6 +902,65 @@ export function GeneratorHub() {
     }
   };
 
+  // Build the ultra-quality request for a result (shared by HD download and speculation)
+  const buildHDRequest = (result: GeneratedImage): FullGenerateRequest | null => {
+    let imageBase64 = '';
+    let mimeType = 'image/jpeg';
+
+    // Try to use uploaded product images first, otherwise use the selected result
+    if (uploadedFiles.length > 0) {
+      const firstFile = uploadedFiles[0];
+      if (firstFile.url.startsWith('data:')) {
+        const matches = firstFile.url.match(/^data:([^;]+);base64,(.+)$/);
+        if (matches) {
+          mimeType = matches[1];
+          imageBase64 = matches[2];
+        }
+      }
+    }
+
+    // Fallback to using the selected result image
+    if (!imageBase64 && result.url.startsWith('data:')) {
+      const matches = result.url.match(/^data:([^;]+);base64,(.+)$/);
+      if (matches) {
+        mimeType = matches[1];
+        imageBase64 = matches[2];
+      }
+    }
+
+    if (!imageBase64) {
+      return null;
+    }
+
+    // Use the stored prompt or generate a new description
+    const promptToUse = generatedPrompt || formData.productDescription || 'High quality fashion product photo';
+
+    return {
+      image_base64: imageBase64,
+      mime_type: mimeType,
+      product_description: promptToUse,
+      generation_type: activeTab,
+      quality: 'ultra', // HD quality
+      form_data: formData,
+      aspect_ratio: '3:4',
+    };
+  };
+
+  // User picked a result: start its HD version early, so "Download HD" is usually instant.
+  // Only for explicit picks - speculating on every automatic post-generation selection
+  // would pay for an ultra prediction per generation.
+  const selectResult = (result: GeneratedImage) => {
+    setSelectedResult(result);
+
+    // Ultra Quality is Pro only - don't spend on users who can't download it
+    if (credits.planTier === 'free') return;
+
+    const hdRequest = buildHDRequest(result);
+    if (hdRequest) {
+      speculateUltra(hdRequest).catch(err => console.warn('HD pre-generation skipped:', err));
+    }
+  };
+
   // Download HD version using Ultra quality model (costs more but better quality)
   const downloadHDImage = async () => {
     if (!selectedResult) {
@@ -926,47 +985,13 @@ export function GeneratorHub() {
     try {
       toast.loading('Generating HD version...', { id: 'hd-gen' });
 
-      let imageBase64 = '';
-      let mimeType = 'image/jpeg';
-
-      // Try to use uploaded product images first, otherwise use the selected result
-      if (uploadedFiles.length > 0) {
-        const firstFile = uploadedFiles[0];
-        if (firstFile.url.startsWith('data:')) {
-          const matches = firstFile.url.match(/^data:([^;]+);base64,(.+)$/);
-          if (matches) {
-            mimeType = matches[1];
-            imageBase64 = matches[2];
-          }
-        }
-      }
-
-      // Fallback to using the selected result image
-      if (!imageBase64 && selectedResult.url.startsWith('data:')) {
-        const matches = selectedResult.url.match(/^data:([^;]+);base64,(.+)$/);
-        if (matches) {
-          mimeType = matches[1];
-          imageBase64 = matches[2];
-        }
-      }
-
-      if (!imageBase64) {
+      const hdRequest = buildHDRequest(selectedResult);
+      if (!hdRequest) {
         throw new Error('Could not extract image for HD generation');
       }
 
-      // Use the stored prompt or generate a new description
-      const promptToUse = generatedPrompt || formData.productDescription || 'High quality fashion product photo';
-
-      // Call backend with ultra quality
-      const result = await generateImage({
-        image_base64: imageBase64,
-        mime_type: mimeType,
-        product_description: promptToUse,
-        generation_type: activeTab,
-        quality: 'ultra', // HD quality
-        form_data: formData,
-        aspect_ratio: '3:4',
-      });
+      // Call backend with ultra quality (picks up the pre-generated result when there is one)
+      const result = await generateImage(hdRequest);
 
       toast.dismiss('hd-gen');
 
@@ -2561,7 +2586,7 @@ export function GeneratorHub() {
                       src={img.url}
                       alt="Generated result"
                       className="w-full h-full object-cover cursor-pointer"
-                      onClick={() => setSelectedResult(img)}
+                      onClick={() => selectResult(img)}
                     />
                   </div>
 
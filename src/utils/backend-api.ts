@@ -8,12 +8,18 @@
  * - analyze(): ~$0.0001 (vision analysis)
  * - generatePreview(): ~$0.02 (for "Try On" button)
  * - generateUltra(): ~$0.08 (for "Download HD" only)
+ * - speculateUltra(): starts the HD generation early when a preview is selected
+ *   (the backend only runs it while under its speculation budget)
  */
 
 // Backend URL - defaults to localhost for development
 // Backend URL - defaults to relative path in production, localhost in dev
 const BACKEND_URL = import.meta.env.VITE_BACKEND_URL || (import.meta.env.PROD ? '' : 'http://localhost:8000');
 
+// Retries of a generation after a dropped connection or a 503 (server restarting)
+const GENERATION_RETRIES = 3;
+const GENERATION_RETRY_DELAY_MS = 2000;
+
 // ============================================
 // Types
 // ============================================
@@ -44,7 +50,7 @@ interface GenerateResponse {
     quality: string;
 }
 
-interface FullGenerateRequest {
+export interface FullGenerateRequest {
     image_base64: string;
     mime_type?: string;
     product_description?: string;
@@ -92,16 +98,12 @@ export async function analyzeImage(params: AnalyzeRequest): Promise<AnalyzeRespo
  * Use this for "Try On" button
  */
 export async function generatePreview(params: GenerateRequest): Promise<GenerateResponse> {
-    const response = await fetch(`${BACKEND_URL}/api/generate/preview`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-            prompt: params.prompt,
-            aspect_ratio: params.aspect_ratio || '3:4',
-            negative_prompt: params.negative_prompt || '',
-            image_base64: params.image_base64,
-        }),
-    });
+    const response = await postGeneration('/api/generate/preview', JSON.stringify({
+        prompt: params.prompt,
+        aspect_ratio: params.aspect_ratio || '3:4',
+        negative_prompt: params.negative_prompt || '',
+        image_base64: params.image_base64,
+    }));
 
     if (!response.ok) {
         let errorDetails = '';
@@ -126,16 +128,12 @@ export async function generatePreview(params: GenerateRequest): Promise<Generate
  * Use this ONLY for "Download HD" button
  */
 export async function generateUltra(params: GenerateRequest): Promise<GenerateResponse> {
-    const response = await fetch(`${BACKEND_URL}/api/generate/ultra`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-            prompt: params.prompt,
-            aspect_ratio: params.aspect_ratio || '3:4',
-            negative_prompt: params.negative_prompt || '',
-            image_base64: params.image_base64,
-        }),
-    });
+    const response = await postGeneration('/api/generate/ultra', JSON.stringify({
+        prompt: params.prompt,
+        aspect_ratio: params.aspect_ratio || '3:4',
+        negative_prompt: params.negative_prompt || '',
+        image_base64: params.image_base64,
+    }));
 
     if (!response.ok) {
         const error = await response.json().catch(() => ({}));
@@ -150,19 +148,7 @@ export async function generateUltra(params: GenerateRequest): Promise<GenerateRe
  * Automatically selects model based on quality parameter
  */
 export async function generateImage(params: FullGenerateRequest): Promise<FullGenerateResponse> {
-    const response = await fetch(`${BACKEND_URL}/api/generate`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-            image_base64: params.image_base64,
-            mime_type: params.mime_type || 'image/jpeg',
-            product_description: params.product_description || '',
-            generation_type: params.generation_type || 'fashion',
-            quality: params.quality || 'preview',
-            aspect_ratio: params.aspect_ratio || '3:4',
-            form_data: params.form_data || null,
-        }),
-    });
+    const response = await postGeneration('/api/generate', fullGenerateBody(params));
 
     if (!response.ok) {
         const error = await response.json().catch(() => ({}));
@@ -172,10 +158,92 @@ export async function generateImage(params: FullGenerateRequest): Promise<FullGe
     return response.json();
 }
 
+/**
+ * Start the ultra generation in the background for a selected preview
+ * Pass the same params the "Download HD" generateImage() call will use,
+ * so that call picks up the parked result instead of waiting.
+ * Returns the backend status ("started", "exists", or why it was skipped)
+ */
+export async function speculateUltra(params: FullGenerateRequest): Promise<string> {
+    const response = await fetch(`${BACKEND_URL}/api/generate/speculate`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: fullGenerateBody({ ...params, quality: 'ultra' }),
+    });
+
+    if (!response.ok) {
+        throw new Error(`Speculation failed: ${response.statusText}`);
+    }
+
+    const data = await response.json();
+    return data.status;
+}
+
+/**
+ * Request body shared by generateImage() and speculateUltra(),
+ * so both produce the same speculation key on the backend
+ */
+function fullGenerateBody(params: FullGenerateRequest): string {
+    return JSON.stringify({
+        image_base64: params.image_base64,
+        mime_type: params.mime_type || 'image/jpeg',
+        product_description: params.product_description || '',
+        generation_type: params.generation_type || 'fashion',
+        quality: params.quality || 'preview',
+        aspect_ratio: params.aspect_ratio || '3:4',
+        form_data: params.form_data || null,
+    });
+}
+
 // ============================================
 // Helper Functions
 // ============================================
 
+/**
+ * Unique key for one user action (one "Try On" or "Download HD" press)
+ */
+function newIdempotencyKey(): string {
+    if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+        return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+/**
+ * POST a generation, retrying dropped connections and 503s (server restarting)
+ * All attempts share one Idempotency-Key, so a retry attaches to the paid
+ * prediction already running (or resumed after a redeploy) instead of starting another
+ */
+async function postGeneration(path: string, body: string): Promise<Response> {
+    const idempotencyKey = newIdempotencyKey();
+
+    for (let attempt = 0; ; attempt++) {
+        try {
+            const response = await fetch(`${BACKEND_URL}${path}`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Idempotency-Key': idempotencyKey,
+                },
+                body,
+            });
+            if (response.status !== 503 || attempt >= GENERATION_RETRIES) {
+                return response;
+            }
+            const retryAfter = Number(response.headers.get('Retry-After'));
+            await sleep(retryAfter > 0 ? retryAfter * 1000 : GENERATION_RETRY_DELAY_MS);
+        } catch (err) {
+            // Network error (e.g. connection dropped by a redeploy or a mobile network switch)
+            if (attempt >= GENERATION_RETRIES) {
+                throw err;
+            }
+            await sleep(GENERATION_RETRY_DELAY_MS * (attempt + 1));
+        }
+    }
+}
+
 /**
  * Convert a File object to base64 string
  */